@@ -0,0 +1,10 @@
+def split_bilingual(text, sep=" / ", default=""):
+    """Split an "Icelandic / English" label into (icelandic, english).
+
+    A single find + slice, so labels without a separator cost one scan and
+    no temporary list. Returns (text, default) when sep does not occur.
+    """
+    i = text.find(sep)
+    if i < 0:
+        return text, default
+    return text[:i], text[i + len(sep):]
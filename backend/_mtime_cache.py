@@ -0,0 +1,19 @@
+import functools
+import os
+
+def cached_by_mtime(maxsize):
+    """lru_cache for functions whose first argument is a file path.
+
+    The file's modification time is added to the cache key (and not passed
+    on), so results are reused until the file is edited, then read again.
+    """
+    def decorator(func):
+        @functools.lru_cache(maxsize=maxsize)
+        def cached(path, mtime, *args):
+            return func(path, *args)
+
+        @functools.wraps(func)
+        def wrapper(path, *args):
+            return cached(path, os.path.getmtime(path), *args)
+        return wrapper
+    return decorator
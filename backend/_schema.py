@@ -0,0 +1,18 @@
+import orjson
+
+from _mtime_cache import cached_by_mtime
+
+SCHEMA_PATH = "backend/config/schemas/test.json"
+
+@cached_by_mtime(maxsize=4)
+def _parse_schema(schema_path):
+    """Parse the schema file"""
+    with open(schema_path, 'rb') as f:
+        return orjson.loads(f.read())
+
+def load_schema(schema_path=SCHEMA_PATH):
+    """Load the schema from test.json, re-reading it only when the file changes.
+
+    The returned dict is shared between callers and must not be modified.
+    """
+    return _parse_schema(schema_path)
@@ -0,0 +1,50 @@
+from typing import NamedTuple
+
+import openpyxl
+import pandas as pd
+
+from _mtime_cache import cached_by_mtime
+
+class RawSheet(NamedTuple):
+    """Raw cell values for one configured banking sheet"""
+    header: tuple             # date row values from data_start_column onwards
+    assets_rows: tuple        # one full row tuple per entry in assets_hierarchy
+    liabilities_rows: tuple   # one full row tuple per entry in liabilities_hierarchy
+
+@cached_by_mtime(maxsize=4)
+def _read_rows(excel_path, sheet_name, max_row):
+    """Read rows 1..max_row of a sheet in a single streaming pass"""
+    wb = openpyxl.load_workbook(excel_path, data_only=True, read_only=True)
+    try:
+        ws = wb[sheet_name]
+        # Don't trust (or compute) the sheet's declared max_column; take rows
+        # as stored and pad them to the widest one ourselves
+        ws.reset_dimensions()
+        rows = list(ws.iter_rows(min_row=1, max_row=max_row, values_only=True))
+    finally:
+        wb.close()
+    
+    width = max(map(len, rows), default=0)
+    return tuple(tuple(row) + (None,) * (width - len(row)) for row in rows)
+
+def load_raw(excel_path, sheet_config):
+    """Load the date row and the assets/liabilities rows described by sheet_config"""
+    date_row = sheet_config["date_row"]
+    assets_row = sheet_config["assets_row"]
+    liabilities_row = sheet_config["liabilities_row"]
+    assets_count = len(sheet_config["assets_hierarchy"])
+    liabilities_count = len(sheet_config["liabilities_hierarchy"])
+
+    max_row = max(date_row, assets_row + assets_count, liabilities_row + liabilities_count)
+    rows = _read_rows(excel_path, sheet_config["sheet"], max_row)
+
+    return RawSheet(
+        header=rows[date_row - 1][sheet_config["data_start_column"] - 1:],
+        assets_rows=rows[assets_row - 1:assets_row - 1 + assets_count],
+        liabilities_rows=rows[liabilities_row - 1:liabilities_row - 1 + liabilities_count]
+    )
+
+def header_dates(header):
+    """Parse the non-empty date row cells in one pd.to_datetime call, dropping cells that aren't dates"""
+    raw_dates = [value for value in header if value]
+    return pd.DatetimeIndex(pd.to_datetime(raw_dates, errors="coerce", format="mixed")).dropna()
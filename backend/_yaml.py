@@ -0,0 +1,5 @@
+import yaml
+
+# PyYAML's libyaml (C) safe dumper when it was built with libyaml, otherwise the
+# pure-Python one. Both write the same YAML.
+YAML_DUMPER = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
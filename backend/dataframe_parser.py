@@ -1,202 +1,129 @@
-import json
+import collections
+import importlib.util
 import os
+import sys
 import pandas as pd
-import openpyxl
-from datetime import datetime
 import numpy as np
 
-def load_schema():
-    """Load the schema from test.json"""
-    schema_path = "backend/config/schemas/test.json"
-    with open(schema_path, 'r', encoding='utf-8') as f:
-        schema = json.load(f)
-    return schema
+from _bilingual import split_bilingual
+from _schema import load_schema
+from _workbook_cache import header_dates, load_raw
+
+# (name, name_is, name_en) for rows without a parent - all missing, nothing to split
+NO_PARENT = (None, None, None)
+
+# Per-row columns of the flat DataFrame, in output order ('date' comes first, 'value' last)
+RowLabels = collections.namedtuple('RowLabels', 'name name_is name_en type parent parent_is parent_en hierarchy_level')
+
+def _numeric_mask(values):
+    """Boolean mask of the int/float entries in an object array.
+
+    openpyxl hands back exact int/float objects, so an identity check on the
+    type is enough (and also rules out bool).
+    """
+    return np.array([type(v) in (int, float) for v in values], dtype=bool)
+
+def _walk_section(section_rows, hierarchy, data_name_column, row_type):
+    """Return (row_values, RowLabels) for each named row of a section"""
+    walked = []
+    current_parents = [NO_PARENT]  # Current parent at each level, indexed by level
+    
+    for level, row_values in zip(hierarchy, section_rows):
+        # Get cell value (name)
+        name = row_values[data_name_column - 1]
+        
+        if name is None:
+            # Skip empty rows
+            continue
+        
+        # Split name into Icelandic and English
+        name_is, name_en = split_bilingual(name) if isinstance(name, str) else (name, "")
+        
+        # Clear parents at this and deeper levels, padding any skipped level
+        del current_parents[level:]
+        current_parents.extend([NO_PARENT] * (level - len(current_parents)))
+        
+        # Get the direct parent (level - 1), reusing the split made when it was read
+        parent, parent_is, parent_en = current_parents[level - 1]
+        
+        # Store this item (already split) as the current parent for this level
+        current_parents.append((name, name_is, name_en))
+        
+        walked.append((row_values, RowLabels(name, name_is, name_en, row_type,
+                                             parent, parent_is, parent_en, level)))
+    
+    return walked
 
 def parse_excel_to_dataframe(excel_path="backend/cache/INN_ReikningarBankakerfis_012025.xlsx"):
     """Parse Excel file using test.json schema and convert to dataframe"""
     schema = load_schema()
     banking_config = schema["INN"]["data"]["reikningar_bankakerfis"]["config"]["sheets"][0]
     
-    # Open Excel file
-    wb = openpyxl.load_workbook(excel_path, data_only=True)
-    sheet_name = banking_config["sheet"]
-    ws = wb[sheet_name]
-    
     # Extract configuration parameters
-    date_row = banking_config["date_row"]
     data_start_column = banking_config["data_start_column"]
     data_name_column = banking_config["data_name_column"]
-    assets_row = banking_config["assets_row"]
-    liabilities_row = banking_config["liabilities_row"]
     assets_hierarchy = banking_config["assets_hierarchy"]
     liabilities_hierarchy = banking_config["liabilities_hierarchy"]
     
-    # Extract dates from header row
-    dates = []
-    for col in range(data_start_column, ws.max_column + 1):
-        date_value = ws.cell(row=date_row, column=col).value
-        if date_value:
-            if isinstance(date_value, datetime):
-                dates.append(date_value)
-            else:
-                try:
-                    dt = pd.to_datetime(date_value)
-                    dates.append(dt)
-                except:
-                    # If it's not a date, just skip it
-                    pass
+    # Read the date row and both sections in a single (cached) workbook pass
+    raw = load_raw(excel_path, banking_config)
     
-    # Store all data rows
-    all_data = []
-    
-    # Process assets
-    parent_stack = {}  # Track parents at each level
-    current_parents = {}  # Current parent at each level
+    # Extract dates from header row
+    dates = header_dates(raw.header)
     
-    row_index = assets_row
-    for level in assets_hierarchy:
-        # Get cell value (name)
-        name = ws.cell(row=row_index, column=data_name_column).value
-        
-        if name is None:
-            # Skip empty rows
-            row_index += 1
-            continue
-        
-        # Split name into Icelandic and English
-        name_is = name
-        name_en = ""
-        if isinstance(name, str) and " / " in name:
-            parts = name.split(" / ", 1)
-            name_is = parts[0]
-            name_en = parts[1]
-        
-        # Store this item as the current parent for this level
-        current_parents[level] = name
-        
-        # Clear parents at deeper levels
-        levels_to_remove = [k for k in current_parents.keys() if k > level]
-        for k in levels_to_remove:
-            if k in current_parents:
-                del current_parents[k]
-        
-        # Get the direct parent (level - 1)
-        parent = current_parents.get(level - 1, None) if level > 1 else None
-        
-        # Split parent into Icelandic and English
-        parent_is = parent
-        parent_en = ""
-        if isinstance(parent, str) and " / " in parent:
-            parts = parent.split(" / ", 1)
-            parent_is = parts[0]
-            parent_en = parts[1]
-        
-        # Extract values for each date
-        for date_idx, col in enumerate(range(data_start_column, data_start_column + len(dates))):
-            value = ws.cell(row=row_index, column=col).value
-            
-            if value is not None and isinstance(value, (int, float)):
-                # Create a row in the dataframe format
-                row = {
-                    'date': dates[date_idx],
-                    'name': name,
-                    'name_is': name_is,
-                    'name_en': name_en,
-                    'type': 'asset',
-                    'parent': parent,
-                    'parent_is': parent_is,
-                    'parent_en': parent_en,
-                    'hierarchy_level': level,
-                    'value': value
-                }
-                all_data.append(row)
-        
-        row_index += 1
+    # Walk both sections, ordering each section's rows by name and putting assets first
+    date_columns = slice(data_start_column - 1, data_start_column - 1 + len(dates))
+    section_rows = []
+    for rows, hierarchy, row_type in ((raw.assets_rows, assets_hierarchy, 'asset'),
+                                      (raw.liabilities_rows, liabilities_hierarchy, 'liability')):
+        walked = _walk_section(rows, hierarchy, data_name_column, row_type)
+        walked.sort(key=lambda item: item[1].name)
+        section_rows.extend(walked)
     
-    # Process liabilities (same logic as assets)
-    current_parents = {}  # Reset current parents
+    labels = [row_labels for _, row_labels in section_rows]
+    values = np.array([row_values[date_columns] for row_values, _ in section_rows], dtype=object)
+    values = values.reshape(len(section_rows), len(dates))
     
-    row_index = liabilities_row
-    for level in liabilities_hierarchy:
-        # Get cell value (name)
-        name = ws.cell(row=row_index, column=data_name_column).value
-        
-        if name is None:
-            # Skip empty rows
-            row_index += 1
-            continue
-        
-        # Split name into Icelandic and English
-        name_is = name
-        name_en = ""
-        if isinstance(name, str) and " / " in name:
-            parts = name.split(" / ", 1)
-            name_is = parts[0]
-            name_en = parts[1]
-        
-        # Store this item as the current parent for this level
-        current_parents[level] = name
-        
-        # Clear parents at deeper levels
-        levels_to_remove = [k for k in current_parents.keys() if k > level]
-        for k in levels_to_remove:
-            if k in current_parents:
-                del current_parents[k]
-        
-        # Get the direct parent (level - 1)
-        parent = current_parents.get(level - 1, None) if level > 1 else None
-        
-        # Split parent into Icelandic and English
-        parent_is = parent
-        parent_en = ""
-        if isinstance(parent, str) and " / " in parent:
-            parts = parent.split(" / ", 1)
-            parent_is = parts[0]
-            parent_en = parts[1]
-        
-        # Extract values for each date
-        for date_idx, col in enumerate(range(data_start_column, data_start_column + len(dates))):
-            value = ws.cell(row=row_index, column=col).value
-            
-            if value is not None and isinstance(value, (int, float)):
-                # Create a row in the dataframe format
-                row = {
-                    'date': dates[date_idx],
-                    'name': name,
-                    'name_is': name_is,
-                    'name_en': name_en,
-                    'type': 'liability',
-                    'parent': parent,
-                    'parent_is': parent_is,
-                    'parent_en': parent_en,
-                    'hierarchy_level': level,
-                    'value': value
-                }
-                all_data.append(row)
-        
-        row_index += 1
+    # Pick the numeric cells date by date, so the cells come out ordered by (date, type, name)
+    numeric = _numeric_mask(values.ravel()).reshape(values.shape)
+    date_idx, row_idx = np.nonzero(numeric.T)
     
-    # Create DataFrame
-    df = pd.DataFrame(all_data)
+    # Create DataFrame from the typed columns; the repeated labels are stored as categoricals
+    label_columns = list(zip(*labels)) or [()] * len(RowLabels._fields)
+    df = pd.DataFrame({'date': dates[date_idx]})
+    for key, column in zip(RowLabels._fields, label_columns):
+        if key == 'hierarchy_level':
+            df[key] = np.asarray(column, dtype=np.int8)[row_idx]
+        else:
+            df[key] = pd.Categorical(column)[row_idx]
+    df['value'] = np.asarray(values[row_idx, date_idx], dtype=np.float64)
     
-    # Sort by date, type, and name
-    df = df.sort_values(['date', 'type', 'name'])
+    # Only needed when the header dates are out of order or repeated
+    if not (dates.is_monotonic_increasing and dates.is_unique):
+        df = df.sort_values(['date', 'type', 'name'])
     
     return df
 
-def save_dataframe(df, csv_path="backend/parsed_data/banking_flat_data.csv", excel_path="backend/parsed_data/banking_flat_data.xlsx"):
-    """Save the dataframe to CSV and Excel"""
-    # Create the directory if it doesn't exist
+def save_csv(df, csv_path="backend/parsed_data/banking_flat_data.csv"):
+    """Save the dataframe to CSV"""
     os.makedirs(os.path.dirname(csv_path), exist_ok=True)
-    
-    # Save as CSV
-    df.to_csv(csv_path, index=False)
+    df.to_csv(csv_path, index=False, chunksize=50000)
     print(f"Saved CSV to {csv_path}")
-    
-    # Save as Excel
-    df.to_excel(excel_path, index=False)
+
+def save_xlsx(df, excel_path="backend/parsed_data/banking_flat_data.xlsx"):
+    """Save the dataframe to Excel, preferring the faster xlsxwriter engine if installed"""
+    os.makedirs(os.path.dirname(excel_path), exist_ok=True)
+    engine = "xlsxwriter" if importlib.util.find_spec("xlsxwriter") else "openpyxl"
+    df.to_excel(excel_path, engine=engine, index=False)
     print(f"Saved Excel to {excel_path}")
 
+def save_dataframe(df, csv_path="backend/parsed_data/banking_flat_data.csv", excel_path="backend/parsed_data/banking_flat_data.xlsx", formats=("csv",)):
+    """Save the dataframe in each of the requested formats ("csv", "xlsx")"""
+    if "csv" in formats:
+        save_csv(df, csv_path)
+    if "xlsx" in formats:
+        save_xlsx(df, excel_path)
+
 def main():
     try:
         print("Parsing Excel file according to test.json schema...")
@@ -213,8 +140,9 @@ def main():
         print("\nSample data:")
         print(df[['date', 'name_is', 'name_en', 'type', 'parent_is', 'hierarchy_level', 'value']].head())
         
-        # Save to files
-        save_dataframe(df)
+        # Save to files (the Excel copy is slow to write, so only on request)
+        formats = ("csv", "xlsx") if "--xlsx" in sys.argv[1:] else ("csv",)
+        save_dataframe(df, formats=formats)
         
     except Exception as e:
         import traceback
@@ -1,23 +1,23 @@
 import pandas as pd
-import json
+import orjson
 from datetime import datetime
 import os
 from pathlib import Path
-import numpy as np
+
+from _bilingual import split_bilingual
+from _workbook_cache import load_raw
 
 def extract_nested_json(file_path, config):
     """Extract nested JSON structure from Excel file based on config."""
     sheet_config = config["sheets"][0]
     sheet_name = sheet_config["sheet"]
     
-    # Read the Excel file
-    df = pd.read_excel(file_path, sheet_name=sheet_name, header=None)
+    # Read the date row and both sections in a single (cached) workbook pass
+    raw = load_raw(file_path, sheet_config)
     
     # Extract dates from date row
-    date_row = sheet_config["date_row"] - 1  # Convert to 0-based index
     dates = []
-    for col in range(sheet_config["data_start_column"] - 1, df.shape[1]):
-        cell_value = df.iloc[date_row, col]
+    for cell_value in raw.header:
         if pd.notna(cell_value):
             if isinstance(cell_value, (datetime, pd.Timestamp)):
                 dates.append(cell_value.strftime("%Y-%m-%d"))
@@ -25,44 +25,28 @@ def extract_nested_json(file_path, config):
                 dates.append(str(cell_value))
     
     # Define parsing function for each section
-    def parse_section(start_row, hierarchy_levels, section_name):
+    def parse_section(section_rows, hierarchy_levels, section_name):
         result = {"name": section_name, "children": []}
         
         # Stack to track parent nodes at each level
         # Each entry is (node, level)
         stack = [(result, 0)]
         
-        current_row = start_row
-        for level in hierarchy_levels:
-            # Get data for current row
-            name_col = sheet_config["data_name_column"] - 1
-            row_data = df.iloc[current_row]
-            
+        name_col = sheet_config["data_name_column"] - 1
+        data_start = sheet_config["data_start_column"] - 1
+        for level, row_data in zip(hierarchy_levels, section_rows):
             # Skip rows with no data
             if pd.isna(row_data[name_col]):
-                current_row += 1
                 continue
                 
             name = str(row_data[name_col]).strip()
             
             # Handle translations if names contain "/"
-            icelandic_name = name
-            english_name = name
-            if "/" in name:
-                parts = name.split("/", 1)
-                icelandic_name = parts[0].strip()
-                english_name = parts[1].strip()
+            icelandic_name, english_name = split_bilingual(name, "/", default=name)
+            icelandic_name, english_name = icelandic_name.strip(), english_name.strip()
             
-            # Prepare values
-            values = {}
-            for i, date in enumerate(dates):
-                col_idx = sheet_config["data_start_column"] - 1 + i
-                if col_idx < df.shape[1]:
-                    val = row_data[col_idx]
-                    if pd.notna(val):
-                        if isinstance(val, (np.integer, np.floating)):
-                            val = float(val)
-                        values[date] = val
+            # Prepare values in one pass over the row's date columns
+            values = {date: val for date, val in zip(dates, row_data[data_start:]) if val is not None}
             
             # Create node
             node = {
@@ -80,23 +64,19 @@ def extract_nested_json(file_path, config):
             # Add to parent and push to stack
             stack[-1][0]["children"].append(node)
             stack.append((node, level))
-            
-            current_row += 1
         
         return result
     
     # Parse assets section
-    assets_row = sheet_config["assets_row"] - 1  # Convert to 0-based index
     assets = parse_section(
-        assets_row, 
+        raw.assets_rows, 
         sheet_config["assets_hierarchy"], 
         "EIGNIR / ASSETS"
     )
     
     # Parse liabilities section
-    liabilities_row = sheet_config["liabilities_row"] - 1  # Convert to 0-based index
     liabilities = parse_section(
-        liabilities_row, 
+        raw.liabilities_rows, 
         sheet_config["liabilities_hierarchy"], 
         "SKULDIR / LIABILITIES"
     )
@@ -147,8 +127,8 @@ if __name__ == "__main__":
     output_dir.mkdir(exist_ok=True)
     
     output_file = output_dir / "banking_system_accounts.json"
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(result, f, ensure_ascii=False, indent=2)
+    with open(output_file, "wb") as f:
+        f.write(orjson.dumps(result, option=orjson.OPT_INDENT_2))
     
     print(f"Extracted nested JSON saved to {output_file}")
     
@@ -1,15 +1,10 @@
-import json
 import os
-import openpyxl
-import pandas as pd
+import orjson
 from datetime import datetime
 
-def load_schema():
-    """Load the schema from test.json"""
-    schema_path = "backend/config/schemas/test.json"
-    with open(schema_path, 'r', encoding='utf-8') as f:
-        schema = json.load(f)
-    return schema
+from _bilingual import split_bilingual
+from _schema import load_schema
+from _workbook_cache import header_dates, load_raw
 
 def extract_hierarchy_data(excel_path):
     """Extract hierarchical data from the Excel file based on the schema"""
@@ -18,13 +13,9 @@ def extract_hierarchy_data(excel_path):
     # Get configuration for the banking system accounts
     banking_config = schema["INN"]["data"]["reikningar_bankakerfis"]["config"]["sheets"][0]
     
-    # Open the Excel file
-    wb = openpyxl.load_workbook(excel_path, data_only=True)
     sheet_name = banking_config["sheet"]
-    ws = wb[sheet_name]
     
     # Extract configuration parameters
-    date_row = banking_config["date_row"]
     data_start_column = banking_config["data_start_column"]
     data_name_column = banking_config["data_name_column"]
     assets_row = banking_config["assets_row"]
@@ -32,38 +23,27 @@ def extract_hierarchy_data(excel_path):
     assets_hierarchy = banking_config["assets_hierarchy"]
     liabilities_hierarchy = banking_config["liabilities_hierarchy"]
     
+    # Read the date row and both sections in a single (cached) workbook pass
+    raw = load_raw(excel_path, banking_config)
+    
     # Extract dates from header row
-    dates = []
-    for col in range(data_start_column, ws.max_column + 1):
-        date_value = ws.cell(row=date_row, column=col).value
-        if date_value:
-            if isinstance(date_value, datetime):
-                dates.append(date_value.strftime("%Y-%m-%d"))
-            else:
-                try:
-                    dt = pd.to_datetime(date_value)
-                    dates.append(dt.strftime("%Y-%m-%d"))
-                except:
-                    # If it's not a date, just skip it
-                    pass
+    dates = header_dates(raw.header).strftime("%Y-%m-%d").tolist()
     
     # Extract assets data with hierarchy
     assets_data = []
-    row_index = assets_row
-    for level in assets_hierarchy:
+    for row_index, (level, row_values) in enumerate(zip(assets_hierarchy, raw.assets_rows), start=assets_row):
         # Get cell value
-        cell_value = ws.cell(row=row_index, column=data_name_column).value
+        cell_value = row_values[data_name_column - 1]
         
         if cell_value is None:
             # Skip empty rows
-            row_index += 1
             continue
             
         # Get values for this row
         values = {}
         for date_idx, col in enumerate(range(data_start_column, data_start_column + len(dates))):
-            value = ws.cell(row=row_index, column=col).value
-            if value is not None and isinstance(value, (int, float)):
+            value = row_values[col - 1]
+            if type(value) in (int, float):
                 values[dates[date_idx]] = value
         
         # Create entry with hierarchy level
@@ -75,34 +55,25 @@ def extract_hierarchy_data(excel_path):
         }
         
         # Split name into Icelandic and English if available
-        if " / " in entry["name"]:
-            parts = entry["name"].split(" / ", 1)
-            entry["is"] = parts[0]
-            entry["en"] = parts[1]
-        else:
-            entry["is"] = entry["name"]
-            entry["en"] = ""
+        entry["is"], entry["en"] = split_bilingual(entry["name"])
             
         assets_data.append(entry)
-        row_index += 1
     
     # Extract liabilities data with hierarchy
     liabilities_data = []
-    row_index = liabilities_row
-    for level in liabilities_hierarchy:
+    for row_index, (level, row_values) in enumerate(zip(liabilities_hierarchy, raw.liabilities_rows), start=liabilities_row):
         # Get cell value
-        cell_value = ws.cell(row=row_index, column=data_name_column).value
+        cell_value = row_values[data_name_column - 1]
         
         if cell_value is None:
             # Skip empty rows
-            row_index += 1
             continue
             
         # Get values for this row
         values = {}
         for date_idx, col in enumerate(range(data_start_column, data_start_column + len(dates))):
-            value = ws.cell(row=row_index, column=col).value
-            if value is not None and isinstance(value, (int, float)):
+            value = row_values[col - 1]
+            if type(value) in (int, float):
                 values[dates[date_idx]] = value
         
         # Create entry with hierarchy level
@@ -114,16 +85,9 @@ def extract_hierarchy_data(excel_path):
         }
         
         # Split name into Icelandic and English if available
-        if " / " in entry["name"]:
-            parts = entry["name"].split(" / ", 1)
-            entry["is"] = parts[0]
-            entry["en"] = parts[1]
-        else:
-            entry["is"] = entry["name"]
-            entry["en"] = ""
+        entry["is"], entry["en"] = split_bilingual(entry["name"])
             
         liabilities_data.append(entry)
-        row_index += 1
     
     # Build hierarchical structure
     return build_hierarchy(excel_path, sheet_name, assets_data, liabilities_data, dates)
@@ -144,46 +108,36 @@ def build_hierarchy(excel_path, sheet_name, assets_data, liabilities_data, dates
 
 def build_section_hierarchy(section_data):
     """Build a hierarchical structure for a section (assets or liabilities)"""
-    # Create a flat list of all items with their hierarchy info
-    nodes = []
+    root_nodes = []
+    last_at_level = [None]  # latest linked node at each level, indexed by level
     
     for item in section_data:
-        # Create node 
+        level = item["hierarchy_level"]
+        
+        # Find the parent list - the root, or the latest node at the level above
+        if level == 1:
+            siblings = root_nodes
+        elif 1 < level <= len(last_at_level):
+            siblings = last_at_level[level - 1]["children"]
+        else:
+            # No parent at the level above - skip the item
+            continue
+        
+        # Create node and link it in place
         node = {
             "id": f"row_{item['row']}",
             "name": item["name"],
             "is": item["is"],
             "en": item["en"],
-            "level": item["hierarchy_level"],
+            "level": level,
             "values": item["values"],
             "children": []
         }
-        nodes.append(node)
-    
-    # Build tree by iterating through the nodes
-    root_nodes = []
-    node_map = {}  # map of level arrays to track parents at each level
-    
-    for node in nodes:
-        level = node["level"]
+        siblings.append(node)
         
-        if level == 1:
-            # Top level node - add to root
-            root_nodes.append(node)
-            # Clear levels above this one
-            node_map = {1: node}
-        else:
-            # Find the right parent - it's the latest node at the level above this one
-            parent_level = level - 1
-            if parent_level in node_map:
-                parent = node_map[parent_level]
-                parent["children"].append(node)
-                # Set this as the latest node at this level
-                node_map[level] = node
-                # Clear any levels deeper than this one
-                keys_to_remove = [k for k in node_map.keys() if k > level]
-                for k in keys_to_remove:
-                    node_map.pop(k, None)
+        # Set this as the latest node at its level and clear any deeper levels
+        del last_at_level[level:]
+        last_at_level.append(node)
     
     return root_nodes
 
@@ -216,8 +170,8 @@ def map_test_schema_to_hierarchy(excel_path="backend/cache/INN_ReikningarBankake
     
     # Save to file
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(readable_structure, f, indent=2, ensure_ascii=False)
+    with open(output_path, 'wb') as f:
+        f.write(orjson.dumps(readable_structure, option=orjson.OPT_INDENT_2))
     
     print(f"Saved hierarchical mapping to {output_path}")
     return readable_structure
@@ -229,29 +183,38 @@ def extract_readable_hierarchy(hierarchy, prefix="", path=None):
     
     result = {}
     
-    for i, item in enumerate(hierarchy):
-        # Create a path identifier
-        current_path = path + [i]
-        path_str = ".".join(map(str, current_path))
+    # Depth-first walk with an explicit stack of
+    # (index, item, parent path, parent path string, parent full path);
+    # children are pushed in reverse so they come off the stack in order
+    stack = [(i, item, path, ".".join(map(str, path)), prefix)
+             for i, item in reversed(list(enumerate(hierarchy)))]
+    while stack:
+        i, item, parent_path, parent_path_str, parent_full_path = stack.pop()
+        name = item.get("name", "")
+        
+        # Extend the parent's path and strings instead of rebuilding them
+        current_path = parent_path + [i]
+        path_str = f"{parent_path_str}.{i}" if parent_path else str(i)
+        full_path = parent_full_path + (f" > {name}" if parent_full_path else name)
         
         # Add to result
         result[path_str] = {
             "id": item.get("id", ""),
-            "name": item.get("name", ""),
+            "name": name,
             "is": item.get("is", ""),
             "en": item.get("en", ""),
             "path": current_path,
             "level": len(current_path),
             "hierarchy_level": item.get("level", 0),
             "index": i,
-            "full_path": prefix + (f"{item.get('name', '')}" if not prefix else f" > {item.get('name', '')}")
+            "full_path": full_path
         }
         
         # Process children if any
-        if "children" in item and item["children"]:
-            child_prefix = prefix + (f"{item.get('name', '')}" if not prefix else f" > {item.get('name', '')}")
-            child_results = extract_readable_hierarchy(item["children"], child_prefix, current_path)
-            result.update(child_results)
+        children = item.get("children")
+        if children:
+            stack.extend((j, child, current_path, path_str, full_path)
+                         for j, child in reversed(list(enumerate(children))))
     
     return result
 
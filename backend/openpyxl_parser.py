@@ -1,16 +1,42 @@
-import json
+import hashlib
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+import logging
 import os
+import sys
 import openpyxl
+import orjson
 from openpyxl.utils import get_column_letter
 import pandas as pd
 from datetime import datetime
 import yaml
 import traceback
+from _bilingual import split_bilingual
+from _yaml import YAML_DUMPER
+
+try:
+    from python_calamine import CalamineWorkbook
+except ImportError:
+    CalamineWorkbook = None
+
+PARSE_CACHE_DIR = "backend/parsed_data/.cache"
+
+logger = logging.getLogger(__name__)
+
+def _calamine_value(value):
+    """Convert a calamine cell value to what openpyxl would have returned for it."""
+    # calamine reports empty cells as ""
+    if value == "":
+        return None
+    # and every number as a float, where openpyxl gives whole numbers as int
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
 
 class ExcelSheetParser:
     """Parser for extracting structured data from Excel sheets based on a JSON template."""
     
-    def __init__(self, excel_path, template_path=None):
+    def __init__(self, excel_path, template_path=None, engine="openpyxl"):
         """
         Initialize the parser.
         
@@ -20,10 +46,19 @@ class ExcelSheetParser:
             Path to the Excel file to parse
         template_path : str, optional
             Path to a JSON template file that describes the structure
+        engine : str, optional
+            "openpyxl" (default) or "calamine". calamine reads much faster but
+            does not expose cell alignment, so hierarchy levels fall back to the
+            leading-space heuristic; keep openpyxl for indent-formatted sheets.
         """
+        if engine == "calamine" and CalamineWorkbook is None:
+            print("WARNING: python-calamine is not installed, using openpyxl")
+            engine = "openpyxl"
         self.excel_path = excel_path
+        self.engine = engine
         self.template = None
         self.wb = None
+        self._region_cache = {}
         
         if template_path:
             self.load_template(template_path)
@@ -31,34 +66,107 @@ class ExcelSheetParser:
     def load_template(self, template_path):
         """Load a JSON template file."""
         print(f"Loading template from {template_path}")
-        with open(template_path, 'r', encoding='utf-8') as f:
-            self.template = json.load(f)
+        with open(template_path, 'rb') as f:
+            self.template = orjson.loads(f.read())
         return self.template
             
     def open_workbook(self):
-        """Open the Excel workbook."""
+        """Open the Excel workbook in read-only mode (sheets are streamed, not held in memory)."""
         if not self.wb:
             print(f"Opening workbook: {self.excel_path}")
-            self.wb = openpyxl.load_workbook(self.excel_path, data_only=True)
+            if self.engine == "calamine":
+                self.wb = CalamineWorkbook.from_path(self.excel_path)
+            else:
+                self.wb = openpyxl.load_workbook(self.excel_path, read_only=True, data_only=True, keep_links=False)
         return self.wb
         
+    def close(self):
+        """Close the workbook."""
+        if self.wb:
+            self.wb.close()
+            self.wb = None
+        
+    def _stream_sheet(self, sheet_name, min_row=1, title_col=None, max_row=None, max_col=None):
+        """
+        Stream a sheet's rows once, yielding (row_idx, values, indent) tuples.
+        
+        Read-only worksheets re-parse the sheet XML on every ws.cell() call, so
+        the methods below consume this iterator instead. values is the tuple of
+        cell values (up to max_col); indent is the alignment indent of the cell
+        in title_col (the only cell whose formatting is needed), or 0. Without a
+        title_col no cell objects are built at all.
+        """
+        # openpyxl reads max_row=0 as "to the end", so an empty range stops here
+        if max_row is not None and max_row < min_row:
+            return
+        
+        if self.engine == "calamine":
+            sheet = self.open_workbook().get_sheet_by_name(sheet_name)
+            rows = sheet.to_python(skip_empty_area=False)[max(min_row - 1, 0):max_row]
+            for row_idx, row in enumerate(rows, start=min_row):
+                yield row_idx, tuple(_calamine_value(value) for value in row[:max_col]), 0
+            return
+        
+        ws = self.open_workbook()[sheet_name]
+        rows = ws.iter_rows(min_row=min_row, max_row=ws.max_row if max_row is None else max_row, max_col=max_col,
+                            values_only=not title_col)
+        if not title_col:
+            for row_idx, values in enumerate(rows, start=min_row):
+                yield row_idx, values, 0
+            return
+        
+        for row_idx, cells in enumerate(rows, start=min_row):
+            values = tuple(cell.value for cell in cells)
+            indent = 0
+            if len(cells) >= title_col and values[title_col - 1] is not None:
+                alignment = cells[title_col - 1].alignment
+                indent = alignment.indent if alignment else 0
+            yield row_idx, values, indent
+        
+    def get_sheet_size(self, sheet_name):
+        """Get (max_row, max_column) of a sheet."""
+        if self.engine == "calamine":
+            end = self.open_workbook().get_sheet_by_name(sheet_name).end
+            # calamine has no end cell for an empty sheet
+            if end is None:
+                return 0, 0
+            return end[0] + 1, end[1] + 1
+        ws = self.open_workbook()[sheet_name]
+        if ws.max_row is not None and ws.max_column is not None:
+            return ws.max_row, ws.max_column
+        
+        # The sheet XML has no <dimension> record, so size it from the rows themselves
+        max_row = max_column = 0
+        for cells in ws.iter_rows():
+            if cells:
+                max_row = cells[-1].row
+                max_column = max(max_column, cells[-1].column)
+        return max_row, max_column
+        
     def get_sheet_names(self):
         """Get all sheet names in the workbook."""
         wb = self.open_workbook()
+        if self.engine == "calamine":
+            return wb.sheet_names
         return wb.sheetnames
         
     def find_data_region(self, sheet_name):
         """
         Find the main data region in a sheet based on template info or auto-detection.
         
+        The result is cached per sheet, so repeated lookups don't re-stream the sheet.
+        
         Returns:
         --------
         tuple
             (start_row, title_col, data_start_col)
         """
-        wb = self.open_workbook()
-        ws = wb[sheet_name]
+        if sheet_name not in self._region_cache:
+            self._region_cache[sheet_name] = self._detect_data_region(sheet_name)
+        return self._region_cache[sheet_name]
         
+    def _detect_data_region(self, sheet_name):
+        """Find the data region from the template, or by scanning the top of the sheet."""
         # If we have template data, use that
         if self.template and 'data' in self.template:
             metadata = self.template.get('metadata', {})
@@ -73,20 +181,21 @@ class ExcelSheetParser:
         
         # Otherwise, auto-detect
         # Look for rows with significant data (not empty)
-        for row_idx in range(1, min(50, ws.max_row)):  # Check first 50 rows
-            non_empty_count = 0
-            for col_idx in range(1, min(20, ws.max_column)):
-                cell_value = ws.cell(row=row_idx, column=col_idx).value
-                if cell_value is not None and str(cell_value).strip():
-                    non_empty_count += 1
-                    
-            # If we found a row with at least 5 non-empty cells, consider it the data start
-            if non_empty_count >= 5:
-                # First column is typically for titles
-                title_col = 1
-                # Data typically starts from the 2nd column
-                data_start_col = 2
-                return (row_idx, title_col, data_start_col)
+        max_row, max_column = self.get_sheet_size(sheet_name)
+        last_row = min(50, max_row)  # Check first 50 rows
+        last_col = min(20, max_column)
+        if last_row > 1 and last_col > 1:
+            for row_idx, values, _ in self._stream_sheet(sheet_name, max_row=last_row - 1, max_col=last_col - 1):
+                # Stop counting as soon as the row has 5 non-empty cells
+                non_empty = (cell_value for cell_value in values if cell_value is not None and str(cell_value).strip())
+                
+                # If we found a row with at least 5 non-empty cells, consider it the data start
+                if sum(1 for _ in islice(non_empty, 5)) >= 5:
+                    # First column is typically for titles
+                    title_col = 1
+                    # Data typically starts from the 2nd column
+                    data_start_col = 2
+                    return (row_idx, title_col, data_start_col)
                 
         # Default values if nothing was found
         return (10, 1, 2)
@@ -111,37 +220,28 @@ class ExcelSheetParser:
             data_region = self.find_data_region(sheet_name)
             
         start_row, title_col, data_start_col = data_region
-        wb = self.open_workbook()
-        ws = wb[sheet_name]
-        
-        print(f"  Extracting dates from header row {start_row-1}, starting at column {data_start_col}")
         
-        dates = []
-        for col in range(data_start_col, ws.max_column + 1):
-            cell_value = ws.cell(row=start_row-1, column=col).value
-            
-            # Print info about what we're seeing
-            print(f"    Column {col}: {type(cell_value)} - {cell_value}")
-            
-            # Skip empty cells
-            if cell_value is None:
-                continue
-                
-            # Try to parse as date (could be a date object or string)
-            date_value = None
-            if isinstance(cell_value, datetime):
-                date_value = cell_value
-            else:
-                # Try common date formats
-                try:
-                    date_value = pd.to_datetime(cell_value)
-                except:
-                    pass
-                
-            if date_value:
-                dates.append(date_value)
+        logger.debug("  Extracting dates from header row %s, starting at column %s", start_row - 1, data_start_col)
+        
+        # A header row past the end of the sheet (e.g. an empty sheet) reads as empty
+        header = next(self._stream_sheet(sheet_name, min_row=start_row - 1, max_row=start_row - 1), None)
+        header_values = header[1][data_start_col - 1:] if header else ()
+        if logger.isEnabledFor(logging.DEBUG):
+            for col, cell_value in enumerate(header_values, start=data_start_col):
+                logger.debug("    Column %s: %s - %s", col, type(cell_value), cell_value)
+        
+        # Skip empty cells
+        raw = [cell_value for cell_value in header_values if cell_value is not None]
+        
+        # Date cells come back as datetimes already; anything else is parsed in a
+        # single to_datetime call, dropping values that aren't dates
+        if all(isinstance(cell_value, datetime) for cell_value in raw):
+            dates = raw
+        else:
+            parsed = pd.to_datetime(pd.Series(raw, dtype=object), errors='coerce', format='mixed')
+            dates = [d for d in parsed if pd.notna(d)]
                 
-        print(f"  Found {len(dates)} dates in header")
+        logger.debug("  Found %s dates in header", len(dates))
         
         # If no dates found but this is the sheet from the template, use those dates
         if not dates and self.template:
@@ -149,12 +249,12 @@ class ExcelSheetParser:
             if metadata.get('sheet') == sheet_name:
                 template_dates = metadata.get('dates', [])
                 if template_dates:
-                    print(f"  Using {len(template_dates)} dates from template")
+                    logger.debug("  Using %s dates from template", len(template_dates))
                     return [pd.to_datetime(d) for d in template_dates]
         
         # If still no dates, create some sample dates for structure
         if not dates:
-            print("  No dates found, creating sample dates")
+            logger.debug("  No dates found, creating sample dates")
             # Create monthly dates for the last 2 years
             end_date = datetime.now()
             dates = [end_date - pd.DateOffset(months=i) for i in range(24)]
@@ -182,15 +282,19 @@ class ExcelSheetParser:
             data_region = self.find_data_region(sheet_name)
             
         start_row, title_col, data_start_col = data_region
-        wb = self.open_workbook()
-        ws = wb[sheet_name]
+        max_row, _ = self.get_sheet_size(sheet_name)
         
-        print(f"  Detected data region: start_row={start_row}, title_col={title_col}, data_start_col={data_start_col}")
+        logger.debug("  Detected data region: start_row=%s, title_col=%s, data_start_col=%s", start_row, title_col, data_start_col)
         
         # Get dates from header
         dates = self.extract_dates_from_header(sheet_name, data_region)
         date_strs = [d.strftime("%Y-%m-%d") for d in dates]
         
+        # Stream the data rows in a single pass, building cells only for the
+        # title column and the columns that have a date
+        last_col = max(title_col, data_start_col - 1 + len(date_strs))
+        rows = self._stream_sheet(sheet_name, min_row=start_row, title_col=title_col, max_col=last_col)
+        
         # Initialize root nodes for assets and liabilities
         assets = {
             "name": "EIGNIR / ASSETS",
@@ -202,93 +306,78 @@ class ExcelSheetParser:
             "children": []
         }
         
-        # Stack to keep track of the current hierarchy
-        hierarchy_stack = []
-        current_section = None
-        
         # Variable to determine if we're in the assets or liabilities section
         in_assets = True
         
-        print(f"  Processing rows from {start_row} to {ws.max_row}")
+        logger.debug("  Processing rows from %s to %s", start_row, max_row)
         
-        # Track how many items we find
-        assets_count = 0
-        liabilities_count = 0
+        # One entry per title row: its node, indent level and section. Positions
+        # where the liabilities section starts are where the hierarchy resets
+        nodes = []
+        levels = []
+        node_in_assets = []
+        section_starts = set()
         
         # Iterate through rows
-        for row_idx in range(start_row, ws.max_row + 1):
-            title_cell = ws.cell(row=row_idx, column=title_col)
-            title_text = title_cell.value
+        for row_idx, values, indent in rows:
+            title_text = values[title_col - 1]
             
             # Skip empty rows
-            if title_text is None or not str(title_text).strip():
+            if title_text is None:
+                continue
+            raw_title = str(title_text)
+            title_text = raw_title.strip()
+            if not title_text:
                 continue
-                
-            # Extract indentation level (based on leading spaces in Excel formula)
-            title_text = str(title_text).strip()
             
             # Check if this is a switch between assets and liabilities
             if "SKULDIR" in title_text or "LIABILITIES" in title_text and row_idx > start_row + 5:
                 in_assets = False
-                hierarchy_stack = []  # Reset the stack
-                print(f"  Switched to liabilities section at row {row_idx}")
+                section_starts.add(len(nodes))  # Reset the hierarchy
+                logger.debug("  Switched to liabilities section at row %s", row_idx)
                 
             # Determine level based on cell's indentation or text
             level = 0
-            if hasattr(title_cell, 'alignment') and title_cell.alignment and title_cell.alignment.indent:
-                level = title_cell.alignment.indent
+            if indent:
+                level = indent
             else:
-                # Try to guess based on leading spaces
-                leading_spaces = len(title_text) - len(title_text.lstrip())
+                # Try to guess based on leading spaces (of the title before stripping)
+                leading_spaces = len(raw_title) - len(raw_title.lstrip(' '))
                 level = leading_spaces // 2  # Assuming 2 spaces per indentation level
             
             # Create node for this item
+            is_name, en_name = split_bilingual(title_text)
             node = {
                 "name": title_text,
-                "is": title_text.split(" / ")[0] if " / " in title_text else title_text,
-                "en": title_text.split(" / ")[1] if " / " in title_text else "",
+                "is": is_name,
+                "en": en_name,
                 "values": {}
             }
             
             # Add values for each date
-            for col_idx, date_str in enumerate(date_strs, start=data_start_col):
-                value = ws.cell(row=row_idx, column=col_idx).value
+            for date_str, value in zip(date_strs, values[data_start_col - 1:]):
                 if value is not None and isinstance(value, (int, float)):
                     node["values"][date_str] = value
             
-            # Adjust the hierarchy stack based on level
-            while len(hierarchy_stack) > level:
-                hierarchy_stack.pop()
-                
-            if level == 0:
-                # This is a top-level item
-                if in_assets:
-                    assets["children"].append(node)
-                    assets_count += 1
-                else:
-                    liabilities["children"].append(node)
-                    liabilities_count += 1
-                hierarchy_stack = [node]
+            nodes.append(node)
+            levels.append(level)
+            node_in_assets.append(in_assets)
+        
+        # Link the nodes into the two sections
+        assets_count = 0
+        liabilities_count = 0
+        for node, parent, is_asset in zip(nodes, assign_parents(levels, section_starts), node_in_assets):
+            if parent >= 0:
+                # Add as child to its parent
+                nodes[parent].setdefault("children", []).append(node)
+            elif is_asset:
+                assets["children"].append(node)
+                assets_count += 1
             else:
-                # This is a child item
-                if not hierarchy_stack:
-                    # If stack is empty but we have a child item, add it to the appropriate top level
-                    if in_assets:
-                        assets["children"].append(node)
-                        assets_count += 1
-                    else:
-                        liabilities["children"].append(node)
-                        liabilities_count += 1
-                    hierarchy_stack = [node]
-                else:
-                    # Add as child to the current parent
-                    parent = hierarchy_stack[-1]
-                    if "children" not in parent:
-                        parent["children"] = []
-                    parent["children"].append(node)
-                    hierarchy_stack.append(node)
-        
-        print(f"  Found {assets_count} assets items and {liabilities_count} liabilities items")
+                liabilities["children"].append(node)
+                liabilities_count += 1
+        
+        logger.debug("  Found %s assets items and %s liabilities items", assets_count, liabilities_count)
         
         # Create the result structure
         result = {
@@ -326,18 +415,105 @@ class ExcelSheetParser:
     def save_as_json(self, data, output_path):
         """Save parsed data as a JSON file."""
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        with open(output_path, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
         print(f"Saved JSON to {output_path}")
         
     def save_as_yaml(self, data, output_path):
         """Save parsed data as a YAML file."""
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
         with open(output_path, 'w', encoding='utf-8') as f:
-            yaml.dump(data, f, sort_keys=False, allow_unicode=True)
+            yaml.dump(data, f, Dumper=YAML_DUMPER, sort_keys=False, allow_unicode=True)
         print(f"Saved YAML to {output_path}")
 
+def assign_parents(levels, section_starts=()):
+    """
+    Compute the parent of each row from its indent level.
+    
+    Parameters:
+    -----------
+    levels : list
+        Indent level of each row, in sheet order
+    section_starts : set, optional
+        Positions where a new section begins, with an empty hierarchy
+        
+    Returns:
+    --------
+    list
+        Position of each row's parent, or -1 for a top-level row. A row is
+        top-level at level 0 or when nothing above it is open; otherwise its
+        parent is the deepest open row once rows at or below its level are closed.
+    """
+    parents = []
+    stack = []
+    for position, level in enumerate(levels):
+        if position in section_starts:
+            stack = []
+        while len(stack) > level:
+            stack.pop()
+        if level == 0 or not stack:
+            parents.append(-1)
+            stack = [position]
+        else:
+            parents.append(stack[-1])
+            stack.append(position)
+    return parents
+
+def _short_hash(key):
+    """First 12 hex digits of the SHA-1 of key."""
+    return hashlib.sha1(key.encode()).hexdigest()[:12]
+
+def parse_cache_path(excel_path, template_path=None, engine="openpyxl"):
+    """
+    Path of the on-disk parse cache for this workbook/template/engine combination.
+    
+    The name is <source>-<version>.json: source identifies the files and engine,
+    version their modification times, so older versions of a source can be found.
+    """
+    template_mtime = os.path.getmtime(template_path) if template_path else None
+    source = _short_hash(f"{excel_path}|{template_path}|{engine}")
+    version = _short_hash(f"{os.path.getmtime(excel_path)}|{template_mtime}")
+    return os.path.join(PARSE_CACHE_DIR, f"{source}-{version}.json")
+
+def load_parse_cache(cache_path):
+    """Load cached {sheet_name: parsed_data} results, or an empty dict if there are none."""
+    if not os.path.exists(cache_path):
+        return {}
+    with open(cache_path, 'rb') as f:
+        return orjson.loads(f.read())
+
+def save_parse_cache(parsed_sheets, cache_path):
+    """Persist {sheet_name: parsed_data} results for the next run, dropping older versions of the same source."""
+    cache_dir, cache_name = os.path.split(cache_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(cache_path, 'wb') as f:
+        f.write(orjson.dumps(parsed_sheets))
+    
+    source = cache_name.split("-")[0]
+    for name in os.listdir(cache_dir):
+        if name.startswith(f"{source}-") and name != cache_name:
+            os.remove(os.path.join(cache_dir, name))
+
+def save_sheet_outputs(parser, sheet_name, parsed_data):
+    """Save one sheet's parsed data as JSON and YAML."""
+    output_json = f"backend/parsed_data/wb_parse_obj_{sheet_name}.json"
+    output_yaml = f"backend/parsed_data/wb_parse_obj_{sheet_name}.yaml"
+    
+    parser.save_as_json(parsed_data, output_json)
+    parser.save_as_yaml(parsed_data, output_yaml)
+
+def _parse_one_sheet(excel_path, template_path, sheet_name, engine="openpyxl"):
+    """Parse and save a single sheet with its own parser (runs in a worker process)."""
+    parser = ExcelSheetParser(excel_path, template_path, engine)
+    try:
+        parsed_data = parser.parse_sheet(sheet_name)
+        save_sheet_outputs(parser, sheet_name, parsed_data)
+    finally:
+        parser.close()
+    return parsed_data
+
 def main():
+    logging.basicConfig(level=logging.DEBUG if "--verbose" in sys.argv else logging.WARNING)
     try:
         # Path to the Excel file and template JSON
         excel_path = "backend/cache/INN_ReikningarBankakerfis_012025.xlsx"
@@ -355,40 +531,65 @@ def main():
             template_path = None
         
         # Create parser
-        parser = ExcelSheetParser(excel_path, template_path)
-        
-        # Get sheet names
-        sheet_names = parser.get_sheet_names()
-        print(f"Found sheets: {sheet_names}")
-        
-        for sheet_name in sheet_names:
-            print(f"\nProcessing sheet: {sheet_name}")
-            try:
-                # Parse the sheet
-                parsed_data = parser.parse_sheet(sheet_name)
-                
-                # Save as JSON and YAML
-                output_json = f"backend/parsed_data/wb_parse_obj_{sheet_name}.json"
-                output_yaml = f"backend/parsed_data/wb_parse_obj_{sheet_name}.yaml"
-                
-                parser.save_as_json(parsed_data, output_json)
-                parser.save_as_yaml(parsed_data, output_yaml)
-                
-                # Print summary
-                dates = parsed_data["metadata"]["dates"]
-                assets = parsed_data["data"]["assets"]["children"]
-                liabilities = parsed_data["data"]["liabilities"]["children"]
-                
-                if dates:
-                    print(f"  - Found {len(dates)} dates from {dates[0]} to {dates[-1]}")
-                else:
-                    print(f"  - No dates found in the sheet")
-                    
-                print(f"  - Found {len(assets)} top-level assets and {len(liabilities)} top-level liabilities")
-                
-            except Exception as e:
-                print(f"Error processing sheet {sheet_name}: {str(e)}")
-                traceback.print_exc()
+        engine = "calamine" if "--calamine" in sys.argv else "openpyxl"
+        parser = ExcelSheetParser(excel_path, template_path, engine)
+        
+        try:
+            # Reuse the previous run's results if neither the workbook nor the template changed
+            cache_path = parse_cache_path(excel_path, template_path, engine)
+            parsed_sheets = load_parse_cache(cache_path)
+            if parsed_sheets:
+                print(f"Using cached parse results from {cache_path}")
+            
+            # Get sheet names
+            sheet_names = list(parsed_sheets) or parser.get_sheet_names()
+            print(f"Found sheets: {sheet_names}")
+            
+            # Sheets are independent, so parse the uncached ones in parallel; each
+            # worker opens the workbook itself
+            to_parse = [sheet_name for sheet_name in sheet_names if sheet_name not in parsed_sheets]
+            futures = {}
+            if to_parse:
+                with ProcessPoolExecutor(max_workers=min(len(to_parse), os.cpu_count() or 1)) as executor:
+                    for sheet_name in to_parse:
+                        futures[sheet_name] = executor.submit(_parse_one_sheet, excel_path, template_path, sheet_name, engine)
+            
+            all_parsed = True
+            for sheet_name in sheet_names:
+                print(f"\nProcessing sheet: {sheet_name}")
+                try:
+                    if sheet_name in futures:
+                        parsed_data = futures[sheet_name].result()
+                        parsed_sheets[sheet_name] = parsed_data
+                    else:
+                        # Cached results are re-saved as a fresh extraction
+                        parsed_data = parsed_sheets[sheet_name]
+                        parsed_data["metadata"]["extracted_at"] = datetime.now().isoformat()
+                        save_sheet_outputs(parser, sheet_name, parsed_data)
+            
+                    # Print summary
+                    dates = parsed_data["metadata"]["dates"]
+                    assets = parsed_data["data"]["assets"]["children"]
+                    liabilities = parsed_data["data"]["liabilities"]["children"]
+            
+                    if dates:
+                        print(f"  - Found {len(dates)} dates from {dates[0]} to {dates[-1]}")
+                    else:
+                        print(f"  - No dates found in the sheet")
+            
+                    print(f"  - Found {len(assets)} top-level assets and {len(liabilities)} top-level liabilities")
+            
+                except Exception as e:
+                    all_parsed = False
+                    print(f"Error processing sheet {sheet_name}: {str(e)}")
+                    traceback.print_exc()
+            
+            # Only cache complete runs, so a sheet that failed is retried next time
+            if all_parsed and not os.path.exists(cache_path):
+                save_parse_cache(parsed_sheets, cache_path)
+            
+        finally:
+            parser.close()
         
         print("\nProcessing complete.")
     except Exception as e:
@@ -1,32 +1,43 @@
+import importlib.util
 import pandas as pd
+import matplotlib
+# Plots are only saved to files, so use the non-interactive Agg backend
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 import seaborn as sns
 import numpy as np
 from pathlib import Path
 
+# Column types for the flat CSV; the low-cardinality label columns the plots
+# group by are read straight into categoricals
+CSV_DTYPES = {
+    'type': 'category',
+    'name_is': 'category',
+    'hierarchy_level': 'int8',
+    'value': 'float64'
+}
+
 def load_data(csv_path="backend/parsed_data/banking_flat_data.csv"):
-    """Load data from CSV file"""
+    """Load data from CSV file, parsing dates and column types during the read"""
     print(f"Loading data from {csv_path}...")
-    df = pd.read_csv(csv_path)
-    
-    # Convert date to datetime
-    df['date'] = pd.to_datetime(df['date'])
+    # Use the multithreaded pyarrow reader when it's installed
+    engine = "pyarrow" if importlib.util.find_spec("pyarrow") else "c"
+    df = pd.read_csv(csv_path, engine=engine, parse_dates=['date'], dtype=CSV_DTYPES)
     
     # Return the DataFrame
     return df
 
-def plot_top_level_trends(df, output_dir="backend/parsed_data"):
-    """Plot trends of top-level assets and liabilities"""
-    # Filter to hierarchy level 1 (top level)
-    top_level = df[df['hierarchy_level'] == 1].copy()
-    
-    # Group by date and type, summing the values
-    grouped = top_level.groupby(['date', 'type'])['value'].sum().reset_index()
-    
-    # Pivot to have types as columns
-    pivoted = grouped.pivot(index='date', columns='type', values='value')
-    
+def pivot_level(df, level, columns):
+    """Filter to one hierarchy level and pivot it to a date x columns table of summed values"""
+    # observed=True: only the label combinations present in the data get a column
+    # (pandas < 3 would otherwise add an all-zero column for every categorical pair)
+    return df[df['hierarchy_level'] == level].pivot_table(
+        index='date', columns=columns, values='value', aggfunc='sum', observed=True
+    )
+
+def plot_top_level_trends(pivoted, output_dir="backend/parsed_data"):
+    """Plot trends of top-level assets and liabilities from the level 1 date x type pivot"""
     # Create plot
     plt.figure(figsize=(12, 6))
     ax = pivoted.plot(figsize=(12, 6), linewidth=2.5)
@@ -52,26 +63,23 @@ def plot_top_level_trends(df, output_dir="backend/parsed_data"):
     print(f"Saved plot to {output_path}")
     plt.close()
 
-def plot_category_comparison(df, output_dir="backend/parsed_data"):
-    """Plot comparison of main categories within assets and liabilities"""
-    # Filter to hierarchy level 2 (main categories)
-    categories = df[df['hierarchy_level'] == 2].copy()
-    
-    # Get top 5 categories by average value for each type
-    top_assets = categories[categories['type'] == 'asset'].groupby('name_is')['value'].mean().nlargest(5).index
-    top_liabilities = categories[categories['type'] == 'liability'].groupby('name_is')['value'].mean().nlargest(5).index
-    
-    # Filter to include only top categories
-    asset_categories = categories[(categories['type'] == 'asset') & (categories['name_is'].isin(top_assets))]
-    liability_categories = categories[(categories['type'] == 'liability') & (categories['name_is'].isin(top_liabilities))]
+def plot_category_comparison(categories, output_dir="backend/parsed_data"):
+    """Plot comparison of main categories from the level 2 date x (type, name_is) pivot"""
+    # Get top 5 categories by average value for each type, in one grouped pass.
+    # Only (type, name) pairs with values are ranked: the pivot is observed-only,
+    # so there are no zero-filled phantom pairs, and pairs without a value are
+    # dropped. A type with no rows in the data gets no lines, leaving its panel empty
+    means = categories.mean().dropna()
+    top = means.groupby(level='type', group_keys=False, observed=True).nlargest(5)
+    top_assets = top['asset'].index if 'asset' in top.index else []
+    top_liabilities = top['liability'].index if 'liability' in top.index else []
     
     # Create plots for assets and liabilities
     fig, axes = plt.subplots(2, 1, figsize=(14, 12), sharex=True)
     
     # Plot assets
     for name in top_assets:
-        data = asset_categories[asset_categories['name_is'] == name]
-        data.set_index('date')['value'].plot(ax=axes[0], linewidth=2, label=name)
+        categories['asset', name].dropna().plot(ax=axes[0], linewidth=2, label=name)
     
     axes[0].set_title('Top Asset Categories Over Time', fontsize=16)
     axes[0].set_ylabel('Value (ISK millions)', fontsize=14)
@@ -80,8 +88,7 @@ def plot_category_comparison(df, output_dir="backend/parsed_data"):
     
     # Plot liabilities
     for name in top_liabilities:
-        data = liability_categories[liability_categories['name_is'] == name]
-        data.set_index('date')['value'].plot(ax=axes[1], linewidth=2, label=name)
+        categories['liability', name].dropna().plot(ax=axes[1], linewidth=2, label=name)
     
     axes[1].set_title('Top Liability Categories Over Time', fontsize=16)
     axes[1].set_ylabel('Value (ISK millions)', fontsize=14)
@@ -101,24 +108,17 @@ def plot_category_comparison(df, output_dir="backend/parsed_data"):
     print(f"Saved plot to {output_path}")
     plt.close()
 
-def plot_stacked_areas(df, output_dir="backend/parsed_data"):
-    """Create stacked area plots for assets and liabilities"""
-    # Filter to hierarchy level 2 (main categories)
-    categories = df[df['hierarchy_level'] == 2].copy()
-    
+def plot_stacked_areas(categories, latest_date, output_dir="backend/parsed_data"):
+    """Create stacked area plots from the level 2 date x (type, name_is) pivot"""
     # Get the latest 10 years of data
-    latest_date = df['date'].max()
     ten_years_ago = latest_date - pd.DateOffset(years=10)
-    recent_data = categories[categories['date'] >= ten_years_ago]
+    recent_data = categories[categories.index >= ten_years_ago]
     
-    # Prepare data for plotting
-    assets_data = recent_data[recent_data['type'] == 'asset'].pivot_table(
-        index='date', columns='name_is', values='value', aggfunc='sum'
-    )
-    
-    liabilities_data = recent_data[recent_data['type'] == 'liability'].pivot_table(
-        index='date', columns='name_is', values='value', aggfunc='sum'
-    )
+    # Prepare data for plotting: drop dates/categories with no values for the type.
+    # The pivot only has observed (type, name) columns, so what's left are the
+    # names with values in the window, as a per-type pivot of it would give
+    assets_data = recent_data['asset'].dropna(how='all').dropna(axis=1, how='all')
+    liabilities_data = recent_data['liability'].dropna(how='all').dropna(axis=1, how='all')
     
     # Fill any missing values
     assets_data = assets_data.fillna(0)
@@ -128,13 +128,13 @@ def plot_stacked_areas(df, output_dir="backend/parsed_data"):
     fig, axes = plt.subplots(2, 1, figsize=(14, 12), sharex=True)
     
     # Assets stacked area
-    assets_data.plot.area(ax=axes[0], stacked=True, alpha=0.7, linewidth=0.5)
+    assets_data.plot.area(ax=axes[0], stacked=True, alpha=0.7, linewidth=0.5, rasterized=True)
     axes[0].set_title('Asset Composition Over the Last 10 Years', fontsize=16)
     axes[0].set_ylabel('Value (ISK millions)', fontsize=14)
     axes[0].legend(fontsize=9, loc='upper left', bbox_to_anchor=(1, 1))
     
     # Liabilities stacked area
-    liabilities_data.plot.area(ax=axes[1], stacked=True, alpha=0.7, linewidth=0.5)
+    liabilities_data.plot.area(ax=axes[1], stacked=True, alpha=0.7, linewidth=0.5, rasterized=True)
     axes[1].set_title('Liability Composition Over the Last 10 Years', fontsize=16)
     axes[1].set_ylabel('Value (ISK millions)', fontsize=14)
     axes[1].set_xlabel('Date', fontsize=14)
@@ -156,11 +156,11 @@ def plot_stacked_areas(df, output_dir="backend/parsed_data"):
 def plot_hierarchy_levels(df, output_dir="backend/parsed_data"):
     """Plot values aggregated by hierarchy level"""
     # Choose a recent date for the snapshot
-    recent_dates = df.sort_values('date')['date'].unique()[-12:]  # Last 12 months
-    snapshot_data = df[df['date'].isin(recent_dates)].copy()
+    recent_dates = df['date'].unique()[-12:]  # Last 12 months (df is sorted by date)
+    snapshot_data = df[df['date'].isin(recent_dates)]
     
     # Group by hierarchy level, type, and calculate mean over the period
-    grouped = snapshot_data.groupby(['hierarchy_level', 'type'])['value'].mean().reset_index()
+    grouped = snapshot_data.groupby(['hierarchy_level', 'type'], observed=True)['value'].mean().reset_index()
     
     # Create plot
     plt.figure(figsize=(10, 6))
@@ -192,22 +192,30 @@ def main():
         'axes.labelcolor': '#333333',
         'axes.titlecolor': '#333333',
         'text.color': '#333333',
-        'figure.facecolor': 'white'
+        'figure.facecolor': 'white',
+        # Render long series paths in chunks
+        'agg.path.chunksize': 10000
     })
     
     # Load data
     df = load_data()
     print(f"Loaded data with {len(df)} rows")
     
+    # Sort by date once and build the level 1/level 2 pivots shared by the plots
+    if not df['date'].is_monotonic_increasing:
+        df = df.sort_values('date', kind='stable')
+    top_level = pivot_level(df, 1, 'type')
+    categories = pivot_level(df, 2, ['type', 'name_is'])
+    
     # Create output directory if it doesn't exist
     output_dir = "backend/parsed_data"
     Path(output_dir).mkdir(parents=True, exist_ok=True)
     
     # Generate plots
     print("Generating plots...")
-    plot_top_level_trends(df, output_dir)
-    plot_category_comparison(df, output_dir)
-    plot_stacked_areas(df, output_dir)
+    plot_top_level_trends(top_level, output_dir)
+    plot_category_comparison(categories, output_dir)
+    plot_stacked_areas(categories, df['date'].max(), output_dir)
     plot_hierarchy_levels(df, output_dir)
     
     print("All plots generated successfully!")
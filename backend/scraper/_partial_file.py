@@ -0,0 +1,26 @@
+import contextlib
+import os
+import tempfile
+
+# os.umask can only be read by setting it, which isn't safe once worker threads
+# are running, so read it once at import
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+@contextlib.contextmanager
+def partial_file(dir, mode='w+b', **kwargs):
+    """
+    Open a temporary file in dir, to be os.replace()d into place once written.
+
+    The file is removed again if the block raises. On success it gets the
+    permissions a plain open() would have given it (0o666 less the umask)
+    instead of the owner-only 0600 tempfile creates it with.
+    """
+    f = tempfile.NamedTemporaryFile(mode, dir=dir, delete=False, **kwargs)
+    try:
+        with f:
+            yield f
+        os.chmod(f.name, 0o666 & ~_UMASK)
+    except BaseException:
+        os.remove(f.name)
+        raise
@@ -0,0 +1,28 @@
+import lxml.html
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import make_headers
+from urllib3.util.retry import Retry
+
+def create_session(pool_size=10):
+    """Create a requests session that keeps connections alive and retries transient failures."""
+    session = requests.Session()
+    retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    
+    # Ask for compressed pages in every encoding urllib3 can decode here
+    # (br/zstd only when brotli/zstandard are installed), and name the client
+    session.headers.update(make_headers(keep_alive=True, accept_encoding=True, user_agent="sedlagogn-scraper/1.0"))
+    return session
+
+def create_html_parser():
+    """
+    Create an HTML parser for the site's pages, which are served as UTF-8.
+    
+    The encoding is fixed so lxml doesn't guess it from the raw bytes. lxml
+    locks a parser for the whole of a parse, so use one per parse rather than
+    sharing an instance between threads.
+    """
+    return lxml.html.HTMLParser(encoding='utf-8')
@@ -0,0 +1,6 @@
+import yaml
+
+# libyaml's C safe loader and dumper when PyYAML was built with libyaml, like
+# backend/_yaml.py (which the scrapers can't import, running from this directory)
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+YAML_DUMPER = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
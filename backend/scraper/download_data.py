@@ -1,8 +1,87 @@
+import functools
 import os
+import threading
 import yaml
-import requests
 import urllib.parse
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from _session import create_session
+from _partial_file import partial_file
+from _yaml import YAML_LOADER
+
+# Number of files downloaded concurrently (and connections kept in the session pool)
+DOWNLOAD_WORKERS = 8
+
+# Bytes read from the response per write when streaming a file to disk
+DOWNLOAD_CHUNK_SIZE = 1 << 16
+
+@functools.lru_cache(maxsize=1)
+def _load_index(yaml_path, mtime):
+    """
+    Load data_links.yaml as {subcategory name: [match, ...]}, cached per mtime as in backend/_mtime_cache.py.
+    
+    The returned dict is shared between callers and must not be modified.
+    """
+    with open(yaml_path, 'r', encoding='utf-8') as f:
+        data = yaml.load(f, Loader=YAML_LOADER)
+    
+    index = {}
+    for category in data or []:
+        for subcategory in category['subcategories']:
+            index.setdefault(subcategory['name'], []).append({
+                'category': category['category'],
+                'subcategory': subcategory['name'],
+                'links': subcategory['links']
+            })
+    return index
+
+def unique_filename(filename, existing_names):
+    """Return filename, or filename with a _N counter if it's already in existing_names, and record it."""
+    name, ext = os.path.splitext(filename)
+    counter = 1
+    while filename in existing_names:
+        filename = f"{name}_{counter}{ext}"
+        counter += 1
+    existing_names.add(filename)
+    return filename
+
+def download_link(session, link_name, link_url, cache_dir, existing_names, names_lock):
+    """
+    Download one link into cache_dir under a unique filename and return the saved path.
+    
+    The file is written to a temporary file in cache_dir and only renamed into
+    place once complete, so failed or partial downloads never appear in the cache.
+    """
+    # TLS is verified against certifi's bundle, or the one named by REQUESTS_CA_BUNDLE
+    with session.get(link_url, timeout=30, stream=True) as response:
+        response.raise_for_status()
+        
+        # Determine filename
+        if "Content-Disposition" in response.headers:
+            # Extract filename from header if available
+            content_disposition = response.headers["Content-Disposition"]
+            filename = content_disposition.split("filename=")[1].strip('"')
+        else:
+            # Use the last part of the URL path as filename
+            filename = os.path.basename(urllib.parse.urlparse(link_url).path)
+            # If empty or no extension, use the link name with a default extension
+            if not filename or '.' not in filename:
+                filename = f"{link_name.replace(' ', '_')}.xlsx"
+        
+        # Stream the file to disk instead of holding it in memory
+        name, ext = os.path.splitext(filename)
+        with partial_file(cache_dir, prefix=f"{name}_", suffix=f"{ext}.part") as f:
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                f.write(chunk)
+    
+    # Move it into the flat cache directory, adding a number to the filename if
+    # it already exists
+    with names_lock:
+        file_path = os.path.join(cache_dir, unique_filename(filename, existing_names))
+    os.replace(f.name, file_path)
+    
+    print(f"  Saved to {file_path}")
+    return file_path
 
 def download_subcategory_data(subcategory_name, yaml_path='backend/scraper/data_links.yaml', cache_dir='backend/cache'):
     """
@@ -23,28 +102,19 @@ def download_subcategory_data(subcategory_name, yaml_path='backend/scraper/data_
 
     ROOT = "https://www.sedlabanki.is"
     
-    # Load data_links.yaml
+    # Load data_links.yaml, indexed by subcategory name
     try:
-        with open(yaml_path, 'r', encoding='utf-8') as f:
-            data = yaml.safe_load(f)
+        index = _load_index(yaml_path, os.path.getmtime(yaml_path))
     except Exception as e:
         print(f"Error loading {yaml_path}: {str(e)}")
         return {"error": f"Failed to load {yaml_path}: {str(e)}"}
     
-    if not data:
+    if not index:
         print(f"No data found in {yaml_path}")
         return {"error": f"No data found in {yaml_path}"}
     
     # Find the specified subcategory
-    matches = []
-    for category in data:
-        for subcategory in category['subcategories']:
-            if subcategory['name'] == subcategory_name:
-                matches.append({
-                    'category': category['category'],
-                    'subcategory': subcategory['name'],
-                    'links': subcategory['links']
-                })
+    matches = index.get(subcategory_name, [])
     
     if not matches:
         print(f"No subcategory found with name: {subcategory_name}")
@@ -58,7 +128,13 @@ def download_subcategory_data(subcategory_name, yaml_path='backend/scraper/data_
         "failed_downloads": []
     }
     
-    # Process each match
+    # One session shared by all download threads, so connections to the host are reused
+    session = create_session(DOWNLOAD_WORKERS)
+    names_lock = threading.Lock()
+    existing_names = set(os.listdir(cache_dir))
+    
+    # Collect the links of every match, then download them concurrently
+    downloads = []
     for match in matches:
         category_name = match['category']
         subcategory_name = match['subcategory']
@@ -66,7 +142,6 @@ def download_subcategory_data(subcategory_name, yaml_path='backend/scraper/data_
         
         print(f"Found {subcategory_name} in category {category_name} with {len(links)} links")
         
-        # Download files from each link
         for link in links:
             link_name = link['name']
             link_url = link['url']
@@ -75,41 +150,18 @@ def download_subcategory_data(subcategory_name, yaml_path='backend/scraper/data_
             if not link_url.startswith('http'):
                 link_url = f"{ROOT}{link_url if link_url.startswith('/') else '/' + link_url}"
             
+            downloads.append((link_name, link_url))
+    
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as executor:
+        futures = []
+        for link_name, link_url in downloads:
             print(f"  Downloading: {link_name} from {link_url}")
-            
+            futures.append(executor.submit(download_link, session, link_name, link_url, cache_dir, existing_names, names_lock))
+        
+        # Collect results in link order
+        for (link_name, link_url), future in zip(downloads, futures):
             try:
-                # Download file
-                response = requests.get(link_url, verify=False, timeout=30)
-                response.raise_for_status()
-                
-                # Determine filename
-                if "Content-Disposition" in response.headers:
-                    # Extract filename from header if available
-                    content_disposition = response.headers["Content-Disposition"]
-                    filename = content_disposition.split("filename=")[1].strip('"')
-                else:
-                    # Use the last part of the URL path as filename
-                    filename = os.path.basename(urllib.parse.urlparse(link_url).path)
-                    # If empty or no extension, use the link name with a default extension
-                    if not filename or '.' not in filename:
-                        filename = f"{link_name.replace(' ', '_')}.xlsx"
-                
-                # Save directly to the flat cache directory
-                file_path = os.path.join(cache_dir, filename)
-                
-                # Ensure unique filename by adding a number if it already exists
-                counter = 1
-                name, ext = os.path.splitext(filename)
-                while os.path.exists(file_path):
-                    filename = f"{name}_{counter}{ext}"
-                    file_path = os.path.join(cache_dir, filename)
-                    counter += 1
-                
-                # Save the file
-                with open(file_path, 'wb') as f:
-                    f.write(response.content)
-                
-                print(f"  Saved to {file_path}")
+                file_path = future.result()
                 
                 # Add to successful downloads
                 result["downloaded_files"].append({
@@ -129,6 +181,8 @@ def download_subcategory_data(subcategory_name, yaml_path='backend/scraper/data_
                     "error": str(e)
                 })
     
+    session.close()
+    
     # Print summary
     print(f"\nDownload summary for {subcategory_name}:")
     print(f"  Found in {len(matches)} categories")
@@ -1,22 +1,63 @@
+import collections
 import os
+import shelve
+import threading
 import yaml
-import requests
-import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from bs4 import BeautifulSoup
+import lxml.html
 import urllib3
+from _session import create_html_parser, create_session
+from _partial_file import partial_file
+from _yaml import YAML_DUMPER, YAML_LOADER
 
 # Suppress InsecureRequestWarning
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# Number of subcategory pages fetched concurrently
+SCRAPE_WORKERS = 10
+
+# Shared by every page fetch, so connections to the host are reused
+SESSION = create_session(SCRAPE_WORKERS)
+
+# Entries of data_links.yaml, turned into mappings in this field order only when dumped
+Category = collections.namedtuple('Category', 'category subcategories')
+Subcategory = collections.namedtuple('Subcategory', 'name links')
+Link = collections.namedtuple('Link', 'name url')
+
+# Scraped links per page URL, with the validators to revalidate them by
+PAGE_CACHE_PATH = 'backend/scraper/.cache'
+
+# Anchors in the first div after the (first) "Tímaraðir" h2, evaluated by libxml2.
+# Only the h2's own leading text is tested, like BeautifulSoup's string= match was;
+# whitespace doesn't affect a substring test for a single word, so it isn't normalised
+TIMARODIR_LINKS = '(//h2[contains(text(), "Tímaraðir")])[1]/following::div[1]//a'
+
+def represent_entry(dumper, entry):
+    """Represent a data_links.yaml entry as a mapping in its field order"""
+    return dumper.represent_mapping('tag:yaml.org,2002:map', zip(entry._fields, entry))
+
+class DataLinksDumper(YAML_DUMPER):
+    """Dumper for data_links.yaml, so its representers don't leak into other dumps"""
+
+for entry_type in (Category, Subcategory, Link):
+    DataLinksDumper.add_representer(entry_type, represent_entry)
+
+def run_page_links_scraper():
+    """Run the page links scraper in this process, rewriting page_links.yaml, and return its data"""
+    # Imported here so dateparser is only loaded when a refresh is needed
+    from scrape_page_links import main as scrape_page_links
+    # Share this scraper's pooled session, so the page fetches that follow reuse its connection
+    return scrape_page_links(SESSION)
+
 def load_page_links(yaml_path='backend/scraper/page_links.yaml'):
     """Load the page links data from YAML file"""
     if not os.path.exists(yaml_path):
         print(f"Warning: {yaml_path} not found, running page links scraper first")
-        subprocess.run(['python', 'backend/scraper/scrape_links_v2.py'])
+        return run_page_links_scraper()
         
     with open(yaml_path, 'r', encoding='utf-8') as f:
-        return yaml.safe_load(f)
+        return yaml.load(f, Loader=YAML_LOADER)
 
 def is_url_stale(subcategory):
     """Check if a URL needs to be refreshed based on next_update date"""
@@ -31,47 +72,80 @@ def is_url_stale(subcategory):
     # If next_update date has passed, the URL is stale
     return today >= next_update
 
-def refresh_subcategory_url(category_name, subcategory_name):
-    """Re-scrape the main page for an updated URL for this specific subcategory"""
-    print(f"Refreshing URL for {category_name} > {subcategory_name}...")
-    
-    # Run the page links scraper to get fresh data
-    subprocess.run(['python', 'backend/scraper/scrape_links_v2.py'])
-    
-    # Load the updated data
-    links_data = load_page_links()
-    
-    # Find the specific subcategory
+def build_index(links_data):
+    """Index the subcategories in page links data by (category name, subcategory name)"""
+    index = {}
     for category in links_data:
-        if category['category'] == category_name:
-            for subcat in category['subcategories']:
-                if subcat['name'] == subcategory_name:
-                    return subcat
+        for subcat in category['subcategories']:
+            # First entry wins, as with a scan in page order
+            index.setdefault((category['category'], subcat['name']), subcat)
+    return index
+
+def refresh_page_links():
+    """Re-scrape the main page for updated subcategory URLs and index the result"""
+    print("Refreshing page links...")
     
-    return None
+    # Run the page links scraper to get fresh data, using what it returns
+    # rather than parsing the page_links.yaml it just wrote
+    return build_index(run_page_links_scraper())
+
+def refresh_subcategory_url(refreshed_index, category_name, subcategory_name):
+    """Look up the updated entry for this specific subcategory in the refreshed page links"""
+    print(f"Refreshing URL for {category_name} > {subcategory_name}...")
+    return refreshed_index.get((category_name, subcategory_name))
+
+def parse_timarodir(source):
+    """Parse a subcategory page (a file-like object or path) and return its Tímaraðir data links"""
+    # A parser per call, as lxml holds its lock through the socket reads too
+    tree = lxml.html.parse(source, parser=create_html_parser())
+    return [Link(el.text_content(), el.attrib['href']) for el in tree.xpath(TIMARODIR_LINKS)]
 
-def scrape_data_links_from_page(url):
+def scrape_data_links_from_page(url, cache, cache_lock):
     """
     Scrape data links from a page by:
     1. Locating the one h2 element with text "Tímaraðir"
     2. Finding anchor elements in div next to the h2
+    
+    Pages already in the cache are requested conditionally and not parsed
+    again if the server answers 304 Not Modified.
     """
     print(f"  Scraping data links from {url}")
     
     try:
+        with cache_lock:
+            cached = cache.get(url)
+        
+        # Revalidate the cached copy instead of downloading the page again
+        headers = {}
+        if cached:
+            if cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+            if cached['last_modified']:
+                headers['If-Modified-Since'] = cached['last_modified']
+        
         # Get the page content
         ROOT = "https://www.sedlabanki.is"
-        response = requests.get(ROOT + url, verify=False, timeout=30)
-        response.raise_for_status()
-        
-        # Parse the HTML
-        soup = BeautifulSoup(response.content, 'html.parser')
+        with SESSION.get(ROOT + url, headers=headers, stream=True, verify=False, timeout=30) as response:
+            if cached and response.status_code == 304:
+                return [Link(**link) for link in cached['links']]
+            response.raise_for_status()
+            
+            # Parse the HTML straight off the socket (un-gzipped) rather than
+            # buffering the whole body first. This runs on the fetch worker
+            # threads, and libxml2 does the parsing and XPath work in C
+            response.raw.decode_content = True
+            links = parse_timarodir(response.raw)
+            
+            # Only pages with a validator can be revalidated later
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+        if etag or last_modified:
+            # Links are pickled as plain dicts, so the cache doesn't depend on where Link is defined
+            with cache_lock:
+                cache[url] = {'etag': etag, 'last_modified': last_modified,
+                              'links': [link._asdict() for link in links]}
         
-        # Find h2 element containing "Tímaraðir" using the string parameter
-        target_h2 = soup.find('h2', string=lambda text: "Tímaraðir" in text if text else False)
-        # Find all anchor elements that come after the h2 element
-        els = target_h2.find_next('div').find_all('a')
-        return [{'name': el.get_text(), 'url': el['href']} for el in els]
+        return links
         
     except Exception as e:
         print(f"  Error scraping {url}: {str(e)}")
@@ -81,18 +155,13 @@ def main():
     # Load page links data
     links_data = load_page_links()
     
-    # Set up hierarchical result structure
-    result = []
-    
-    # Process each category
+    # Resolve the current URL of every subcategory first, refreshing stale ones.
+    # The main page is re-scraped at most once per run, on the first stale one
+    refreshed_index = None
+    pages = []
     for category in links_data:
         category_name = category['category']
-        
-        # Create category entry
-        category_entry = {
-            'category': category_name,
-            'subcategories': []
-        }
+        category_pages = []
         
         # Process each subcategory
         for subcategory in category['subcategories']:
@@ -104,7 +173,9 @@ def main():
                 print(f"URL is stale for {subcategory_name} - last updated: {subcategory.get('last_update')}, next update: {subcategory.get('next_update')}")
                 
                 # Get refreshed subcategory data
-                updated_subcategory = refresh_subcategory_url(category_name, subcategory_name)
+                if refreshed_index is None:
+                    refreshed_index = refresh_page_links()
+                updated_subcategory = refresh_subcategory_url(refreshed_index, category_name, subcategory_name)
                 
                 if updated_subcategory:
                     # Use the refreshed URL and dates
@@ -114,72 +185,75 @@ def main():
                     print(f"New last_update: {subcategory.get('last_update')}")
                     print(f"New next_update: {subcategory.get('next_update')}")
             
-            # Now process the URL (stale or fresh)
-            try:
-                print(f"Processing {subcategory_name} from {current_url}")
-                
-                # Scrape data links from the page
-                data_links = scrape_data_links_from_page(current_url)
-                
-                # Skip if no data links
-                if not data_links:
-                    print(f"  No data links found for {subcategory_name}")
-                    continue
-                
-                # Create subcategory entry
-                subcategory_entry = {
-                    'name': subcategory_name,
-                    'links': data_links
-                }
-                
-                # Add to category's subcategories list
-                category_entry['subcategories'].append(subcategory_entry)
-                
-            except Exception as e:
-                print(f"Error processing {subcategory_name}: {str(e)}")
+            category_pages.append((subcategory_name, current_url))
         
-        # Only add categories that have subcategories with links
-        if category_entry['subcategories']:
-            result.append(category_entry)
-    
-    # Define a custom YAML representer to force field order
-    def represent_dict_order(self, data):
-        if 'category' in data and 'subcategories' in data:
-            # Order for category entries: category, then subcategories
-            return self.represent_mapping('tag:yaml.org,2002:map', [
-                ('category', data['category']), 
-                ('subcategories', data['subcategories'])
-            ])
-        elif 'name' in data and 'links' in data:
-            # Order for subcategory entries: name, then links
-            return self.represent_mapping('tag:yaml.org,2002:map', [
-                ('name', data['name']), 
-                ('links', data['links'])
-            ])
-        elif 'name' in data and 'url' in data:
-            # Order for link entries: name, then url
-            return self.represent_mapping('tag:yaml.org,2002:map', [
-                ('name', data['name']), 
-                ('url', data['url'])
-            ])
-        # Default behavior for other dictionaries
-        return self.represent_mapping('tag:yaml.org,2002:map', data.items())
-    
-    # Add the custom representer to the YAML dumper
-    yaml.add_representer(dict, represent_dict_order)
+        pages.append((category_name, category_pages))
     
     # Save results to YAML
     output_path = 'backend/scraper/data_links.yaml'
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     
-    with open(output_path, 'w', encoding='utf-8') as f:
-        yaml.dump(result, f, allow_unicode=True, default_flow_style=False)
+    # The page fetches are network-bound, so scrape them concurrently (stale or fresh).
+    # shelve isn't thread-safe, so the workers share one lock around the cache
+    cache_lock = threading.Lock()
+    with shelve.open(PAGE_CACHE_PATH) as cache, ThreadPoolExecutor(max_workers=SCRAPE_WORKERS) as executor:
+        scraped = []
+        for category_name, category_pages in pages:
+            futures = []
+            for subcategory_name, current_url in category_pages:
+                print(f"Processing {subcategory_name} from {current_url}")
+                futures.append((subcategory_name, executor.submit(scrape_data_links_from_page, current_url, cache, cache_lock)))
+            scraped.append((category_name, futures))
+        
+        # Set up hierarchical result structure
+        result = []
+        
+        # Write each category out as soon as its pages are scraped, to a temporary
+        # file that only replaces the output once every category is written
+        with partial_file(os.path.dirname(output_path), mode='w', encoding='utf-8',
+                          prefix='data_links_', suffix='.yaml.part') as f:
+            # Process each category
+            for category_name, futures in scraped:
+                # Create category entry
+                category_entry = Category(category_name, [])
+                
+                # Process each subcategory
+                for subcategory_name, future in futures:
+                    try:
+                        # Data links scraped from the page
+                        data_links = future.result()
+                        
+                        # Skip if no data links
+                        if not data_links:
+                            print(f"  No data links found for {subcategory_name}")
+                            continue
+                        
+                        # Create subcategory entry
+                        subcategory_entry = Subcategory(subcategory_name, data_links)
+                        
+                        # Add to category's subcategories list
+                        category_entry.subcategories.append(subcategory_entry)
+                        
+                    except Exception as e:
+                        print(f"Error processing {subcategory_name}: {str(e)}")
+                
+                # Only add categories that have subcategories with links. Dumping
+                # them one by one gives the same block sequence as one dump
+                if category_entry.subcategories:
+                    result.append(category_entry)
+                    yaml.dump([category_entry], f, Dumper=DataLinksDumper, allow_unicode=True, default_flow_style=False)
+            
+            # An empty sequence has no block form
+            if not result:
+                yaml.dump(result, f, Dumper=DataLinksDumper, allow_unicode=True, default_flow_style=False)
+    
+    os.replace(f.name, output_path)
     
     print(f"\nSaved data links to {output_path}")
     print(f"Found {len(result)} categories")
-    total_subcategories = sum(len(cat['subcategories']) for cat in result)
+    total_subcategories = sum(len(cat.subcategories) for cat in result)
     print(f"Found {total_subcategories} subcategories with data links")
-    total_links = sum(sum(len(subcat['links']) for subcat in cat['subcategories']) for cat in result)
+    total_links = sum(sum(len(subcat.links) for subcat in cat.subcategories) for cat in result)
     print(f"Found {total_links} total data links")
     
     return result
@@ -1,85 +1,150 @@
 import os
+import re
+import functools
 import yaml
-from bs4 import BeautifulSoup
-import requests
+import lxml.html
 import urllib3
 from datetime import datetime
-import dateparser
+from dateparser.date import DateDataParser
+from _partial_file import partial_file
+from _session import create_html_parser, create_session
+from _yaml import YAML_DUMPER
 
 # Suppress only the specific InsecureRequestWarning
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# h4 category titles inside the (first) newslist div, matched on class tokens
+CATEGORY_TITLES = ('(//div[contains(concat(" ", normalize-space(@class), " "), " newslist ")])[1]'
+                   '//h4[contains(concat(" ", normalize-space(@class), " "), " htitle ")]')
+
+def _text(el):
+    """Stripped text fragments of an element joined together"""
+    return ''.join(t.strip() for t in el.itertext())
+
+# Icelandic month names as printed on the site
+IS_MONTHS = {
+    'janúar': 1, 'febrúar': 2, 'mars': 3, 'apríl': 4, 'maí': 5, 'júní': 6,
+    'júlí': 7, 'ágúst': 8, 'september': 9, 'október': 10, 'nóvember': 11, 'desember': 12
+}
+
+# "15. janúar 2024" and "15.01.2024" / "15/01/2024"
+DATE_RE = re.compile(r'(\d{1,2})\.\s*([a-záéíóúýþæö]+)\s*(\d{4})', re.I)
+NUMERIC_RE = re.compile(r'(\d{1,2})[./](\d{1,2})[./](\d{4})')
+
+# One Icelandic parser for every fallback, rather than dateparser.parse building one per call
+DATE_PARSER = DateDataParser(languages=['is'], settings={'DATE_ORDER': 'DMY'})
+
+def _match_date(date_str):
+    """Parse the date formats the site uses with plain regexes, None if it isn't one of them"""
+    match = DATE_RE.fullmatch(date_str)
+    if match:
+        month = IS_MONTHS.get(match.group(2).lower())
+        if month is None:
+            return None
+        day, year = int(match.group(1)), int(match.group(3))
+    else:
+        match = NUMERIC_RE.fullmatch(date_str)
+        if not match:
+            return None
+        day, month, year = (int(g) for g in match.groups())
+    
+    try:
+        return datetime(year, month, day)
+    except ValueError:
+        return None
+
+@functools.lru_cache(maxsize=4096)
 def parse_icelandic_date(date_str):
-    """Parse Icelandic dates using dateparser"""
+    """Parse Icelandic dates, falling back to dateparser for unusual formats"""
     if not date_str or date_str.strip() == "":
         return None
     
-    # Use dateparser with Icelandic language settings
-    parsed_date = dateparser.parse(
-        date_str.replace('\xa0', ' ').strip(),
-        languages=['is'],
-        settings={'DATE_ORDER': 'DMY'}
-    )
+    date_str = date_str.replace('\xa0', ' ').strip()
+    parsed_date = _match_date(date_str)
+    if parsed_date is None:
+        parsed_date = DATE_PARSER.get_date_data(date_str).date_obj
     
     return parsed_date.strftime('%Y-%m-%d') if parsed_date else None
 
-def main():
+class PageLinksDumper(YAML_DUMPER):
+    """Dumper for page_links.yaml, so its representer doesn't leak into other dumps"""
+
+def represent_dict_order(self, data):
+    """Represent page links entries with their fields in a fixed order"""
+    if 'category' in data:
+        return self.represent_mapping('tag:yaml.org,2002:map', 
+            [('category', data['category']), ('subcategories', data['subcategories'])])
+    elif 'name' in data:
+        return self.represent_mapping('tag:yaml.org,2002:map',
+            [(k, data[k]) for k in ['name', 'url', 'last_update', 'next_update'] if k in data])
+    return self.represent_mapping('tag:yaml.org,2002:map', data.items())
+
+PageLinksDumper.add_representer(dict, represent_dict_order)
+
+def main(session=None):
+    if session is None:
+        session = create_session()
+    
     # Scrape data from main page
-    page = requests.get("https://www.sedlabanki.is/hagtolur/talnaefni", verify=False)
-    soup = BeautifulSoup(page.content, 'html.parser')
+    # Parse the HTML straight off the socket (un-gzipped) rather than buffering the whole body first
+    url = "https://www.sedlabanki.is/hagtolur/talnaefni"
+    with session.get(url, stream=True, verify=False, timeout=30) as page:
+        page.raise_for_status()
+        page.raw.decode_content = True
+        tree = lxml.html.parse(page.raw, parser=create_html_parser())
     result = []
     
+    # An error page or a redesigned site has no category headings; fail rather
+    # than overwrite a good page_links.yaml with nothing
+    headings = tree.xpath(CATEGORY_TITLES)
+    if not headings:
+        raise ValueError(f"No category headings found on {url}")
+    
     # Process each category
-    for h4 in soup.find('div', class_='newslist').find_all('h4', class_='htitle'):
+    for h4 in headings:
         category = {
-            'category': h4.text.strip(),
+            'category': h4.text_content().strip(),
             'subcategories': []
         }
         
         # Process rows in the table
-        table = h4.find_next('table')
-        for row in table.find_all('tr')[1:]:  # Skip header row
-            cells = row.find_all('td')
+        table = h4.xpath('following::table[1]')[0]
+        for row in table.xpath('(.//tr)[position() > 1]'):  # Skip header row
+            cells = row.xpath('.//td')
             if len(cells) < 6:  # Need at least 6 cells
                 continue
             
             # Get link and dates
-            anchor = cells[0].find('a')
-            if not anchor:
+            anchor = cells[0].find('.//a')
+            if anchor is None:
                 continue
                 
             # Build entry
             category['subcategories'].append({
-                'name': anchor.get_text(strip=True),
-                'url': anchor['href'],
-                'last_update': parse_icelandic_date(cells[3].get_text(strip=True)),
-                'next_update': parse_icelandic_date(cells[5].get_text(strip=True))
+                'name': _text(anchor),
+                'url': anchor.attrib['href'],
+                'last_update': parse_icelandic_date(_text(cells[3])),
+                'next_update': parse_icelandic_date(_text(cells[5]))
             })
         
         # Add category if it has entries
         if category['subcategories']:
             result.append(category)
     
-    # Define field order representer
-    def represent_dict_order(self, data):
-        if 'category' in data:
-            return self.represent_mapping('tag:yaml.org,2002:map', 
-                [('category', data['category']), ('subcategories', data['subcategories'])])
-        elif 'name' in data:
-            return self.represent_mapping('tag:yaml.org,2002:map',
-                [(k, data[k]) for k in ['name', 'url', 'last_update', 'next_update'] if k in data])
-        return self.represent_mapping('tag:yaml.org,2002:map', data.items())
-    
     # Save to YAML
     output_path = 'backend/scraper/page_links.yaml'
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    yaml.add_representer(dict, represent_dict_order)
     
-    with open(output_path, 'w', encoding='utf-8') as f:
-        yaml.dump(result, f, allow_unicode=True, default_flow_style=False)
+    # Write to a temporary file first, so a failed write leaves the old file in place
+    with partial_file(os.path.dirname(output_path), mode='w', encoding='utf-8',
+                      prefix='page_links_', suffix='.yaml.part') as f:
+        yaml.dump(result, f, Dumper=PageLinksDumper, allow_unicode=True, default_flow_style=False)
+    os.replace(f.name, output_path)
     
     # Print summary
     print(f"\nSaved {len(result)} categories with {sum(len(cat['subcategories']) for cat in result)} subcategories to {output_path}")
+    
+    return result
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file